@@ -2,9 +2,11 @@
 
 import streamlit as st
 import os
-import json
+import orjson
+import asyncio
+import httpx
 from dotenv import load_dotenv
-from openai import OpenAI
+from openai import AsyncOpenAI
 
 # Import our refactored tool functions
 from graph_analyzer import get_user_expertise, get_experts_for_technology
@@ -12,27 +14,40 @@ from qa_engine import semantic_search_for_concept
 
 # --- Configuration ---
 load_dotenv()
-try:
-    client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-except Exception as e:
-    st.error(f"Failed to initialize OpenAI client: {e}")
-    st.stop()
+
+def make_openai_client():
+    """Builds an async OpenAI client over a pooled httpx transport.
+
+    Async so the router can overlap several tool calls in one turn, pooled
+    so connections stay alive between the planning and synthesis calls
+    instead of paying a TLS handshake each time. Created once PER SESSION,
+    right next to that session's event loop — httpx keep-alive connections
+    belong to the loop that opened them, so one process-wide client shared
+    across sessions (each driving its own loop) would fail the moment one
+    session reused a connection another session's loop created.
+    """
+    http_client = httpx.AsyncClient(
+        limits=httpx.Limits(max_keepalive_connections=20)
+    )
+    return AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"), http_client=http_client)
 
 class OpenAIRouter:
     def __init__(self):
-        # Map tool names to their actual Python functions
+        # Map tool names to their actual Python functions. All three tools
+        # synthesize their own final-form answer internally (each one ends
+        # with a gpt-4o-mini call), so "is_final" marks that a lone tool
+        # result can be returned as-is without a second polishing pass.
         self.available_tools = {
-            "get_user_expertise": get_user_expertise,
-            "get_experts_for_technology": get_experts_for_technology,
-            "semantic_search_for_concept": semantic_search_for_concept,
+            "get_user_expertise": {"fn": get_user_expertise, "is_final": True},
+            "get_experts_for_technology": {"fn": get_experts_for_technology, "is_final": True},
+            "semantic_search_for_concept": {"fn": semantic_search_for_concept, "is_final": True},
         }
         self.model = "gpt-4o-mini" # A great, cost-effective model that supports tool calling
 
-    def _get_tool_definitions(self):
-        """
-        Returns the JSON schema definitions for the tools the model can use.
-        """
-        return [
+        # The JSON schema definitions for the tools the model can use.
+        # Built once here — the list is identical on every turn, so there's
+        # no reason to reallocate it per route() call.
+        self._tool_defs = [
             {
                 "type": "function",
                 "function": {
@@ -86,54 +101,77 @@ class OpenAIRouter:
             },
         ]
 
-    def route(self, messages: list):
+    async def route(self, messages: list):
         st.info("**Thinking...** Analyzing your question to find the best tool.")
-        
+        client = st.session_state.openai_client
+
         # 1. First API Call (The "Planning" Step)
-        response = client.chat.completions.create(
+        response = await client.chat.completions.create(
             model=self.model,
             messages=messages,
-            tools=self._get_tool_definitions(),
+            tools=self._tool_defs,
             tool_choice="auto",
         )
         response_message = response.choices[0].message
-        
-        # Convert ChatCompletionMessage to dictionary format for session state
+
+        # Convert ChatCompletionMessage to dictionary format for session state.
+        # Everything appended to the history is a plain dict (the tool calls
+        # included), so the render loop never has to sniff object types.
         message_dict = {"role": response_message.role, "content": response_message.content}
         if response_message.tool_calls:
-            message_dict["tool_calls"] = response_message.tool_calls
+            message_dict["tool_calls"] = [
+                {
+                    "id": tc.id,
+                    "type": "function",
+                    "function": {"name": tc.function.name, "arguments": tc.function.arguments},
+                }
+                for tc in response_message.tool_calls
+            ]
         messages.append(message_dict)
-        
-        # Check if the model wants to call a tool
+
+        # Check if the model wants to call tools
         if response_message.tool_calls:
-            tool_call = response_message.tool_calls[0]
-            function_name = tool_call.function.name
-            function_args = json.loads(tool_call.function.arguments)
-            
-            st.success(f"**Router Decision:** Chose the `{function_name}` tool.")
-            st.write("Arguments:", function_args)
-
-            # 2. Execute the Chosen Tool
-            function_to_call = self.available_tools[function_name]
-            with st.spinner(f"Running tool `{function_name}`..."):
-                function_response = function_to_call(**function_args)
-            
-            st.write("Tool Output:")
-            st.info(function_response)
+            tool_calls = response_message.tool_calls
+            chosen = ", ".join(f"`{tc.function.name}`" for tc in tool_calls)
+            st.success(f"**Router Decision:** Chose the {chosen} tool(s).")
+
+            # 2. Execute ALL chosen tools concurrently.
+            # The tools are blocking (Neo4j / Chroma / LLM calls), so each one
+            # runs in a worker thread; the turn costs max(tool) instead of
+            # sum(tools) when the model requests several at once.
+            with st.spinner(f"Running {len(tool_calls)} tool(s)..."):
+                tasks = [
+                    asyncio.to_thread(
+                        self.available_tools[tc.function.name]["fn"],
+                        **orjson.loads(tc.function.arguments),
+                    )
+                    for tc in tool_calls
+                ]
+                tool_results = await asyncio.gather(*tasks)
 
             # 3. Second API Call (The "Synthesis" Step)
-            # Append the tool's output to the conversation history
-            messages.append(
-                {
-                    "tool_call_id": tool_call.id,
-                    "role": "tool",
-                    "name": function_name,
-                    "content": function_response,
-                }
-            )
-            
+            # Append one tool-role message per result, in the original order.
+            for tool_call, function_response in zip(tool_calls, tool_results):
+                st.write(f"Output of `{tool_call.function.name}`:")
+                st.info(function_response)
+                messages.append(
+                    {
+                        "tool_call_id": tool_call.id,
+                        "role": "tool",
+                        "name": tool_call.function.name,
+                        "content": function_response,
+                    }
+                )
+
+            # Short-circuit: a single final-form tool result is already a
+            # polished answer (the tool ran its own synthesis LLM call), so a
+            # second completions call would just re-bill tokens to re-polish
+            # it. Only synthesize when several tool outputs need combining.
+            if len(tool_calls) == 1 and self.available_tools[tool_calls[0].function.name]["is_final"]:
+                return tool_results[0] or "I apologize, but I couldn't generate a response."
+
             with st.spinner("Synthesizing final answer..."):
-                final_response = client.chat.completions.create(
+                final_response = await client.chat.completions.create(
                     model=self.model,
                     messages=messages,
                 )
@@ -148,12 +186,10 @@ st.set_page_config(page_title="Intelligent GitHub KB", layout="wide", page_icon=
 st.title("🧠 Intelligent Knowledge Base Router (OpenAI)")
 st.write("This app uses an LLM to automatically route your question to the best data source.")
 
-# Use caching to only initialize the router once
-@st.cache_resource
-def get_router():
-    return OpenAIRouter()
-
-router = get_router()
+# The router is stateless and cheap to build (it holds only the tool map and
+# schema), and the heavyweight resources behind the tools are process-wide
+# singletons in graph_analyzer / qa_engine — so no st.cache_resource needed.
+router = OpenAIRouter()
 
 st.write("**Example Questions:**")
 st.markdown("""
@@ -166,27 +202,26 @@ st.markdown("""
 if "messages" not in st.session_state:
     st.session_state.messages = [{"role": "system", "content": "You are a helpful engineering knowledge assistant."}]
 
-for message in st.session_state.messages:
-    # Don't display the system message or tool calls in the chat UI
-    # Handle both dictionary messages and OpenAI message objects
+# One long-lived event loop per session, with its own pooled OpenAI client
+# (see make_openai_client for why the two must live and die together).
+# asyncio.run would tear the loop down after every turn, stranding the
+# pooled keep-alive connections.
+if "event_loop" not in st.session_state:
+    st.session_state.event_loop = asyncio.new_event_loop()
     try:
-        if isinstance(message, dict):  # Dictionary message
-            role = message.get("role", "")
-            content = message.get("content", "")
-            has_tool_calls = "tool_calls" in message
-        elif hasattr(message, 'role'):  # OpenAI message object
-            role = getattr(message, 'role', '')
-            content = getattr(message, 'content', '')
-            has_tool_calls = hasattr(message, 'tool_calls') and getattr(message, 'tool_calls', None)
-        else:
-            continue  # Skip unknown message types
-        
-        if role in ["user", "assistant"] and not has_tool_calls and content:
-            with st.chat_message(role):
-                st.markdown(content)
-    except (KeyError, TypeError, AttributeError):
-        # Skip malformed messages
-        continue
+        st.session_state.openai_client = make_openai_client()
+    except Exception as e:
+        st.error(f"Failed to initialize OpenAI client: {e}")
+        st.stop()
+
+# Don't display the system message or tool calls in the chat UI.
+# The history only ever contains plain dicts (route() normalizes at append
+# time), so this loop is a straight dict read — it runs on every Streamlit
+# rerun for every message, so it should stay cheap.
+for message in st.session_state.messages:
+    if message["role"] in ("user", "assistant") and message.get("content") and "tool_calls" not in message:
+        with st.chat_message(message["role"]):
+            st.markdown(message["content"])
 
 if prompt := st.chat_input("Ask a question..."):
     st.session_state.messages.append({"role": "user", "content": prompt})
@@ -194,7 +229,9 @@ if prompt := st.chat_input("Ask a question..."):
         st.markdown(prompt)
 
     with st.chat_message("assistant"):
-        final_answer = router.route(st.session_state.messages)
+        final_answer = st.session_state.event_loop.run_until_complete(
+            router.route(st.session_state.messages)
+        )
         st.markdown(final_answer)
         # Append the final answer to history for context in the next turn
         st.session_state.messages.append({"role": "assistant", "content": final_answer})
\ No newline at end of file
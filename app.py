@@ -1,7 +1,7 @@
 # app.py
 
 import streamlit as st
-from qa_engine import KnowledgeRetriever, AnswerSynthesizer, openai_client # Import our backend
+from qa_engine import get_retriever, get_synthesizer, run_async # Import our backend
 
 # --- Page Configuration ---
 st.set_page_config(
@@ -13,19 +13,11 @@ st.set_page_config(
 st.title("🤖 GitHub Expertise Finder")
 st.write("Ask a question to find experts in your organization based on their GitHub contributions.")
 
-# --- Caching the Backend ---
-# @st.cache_resource is a key Streamlit command. It tells Streamlit to run this
-# function only once, and then keep the returned object in cache. This prevents
-# reloading the models and reconnecting to the databases on every user interaction.
-@st.cache_resource
-def get_retriever():
-    return KnowledgeRetriever()
-
-@st.cache_resource
-def get_synthesizer():
-    # Using the openai_client we imported from qa_engine
-    return AnswerSynthesizer(openai_client)
-
+# --- The Backend ---
+# qa_engine keeps process-wide singletons, so the models are loaded and the
+# databases connected exactly once per server process. On every rerun these
+# calls are a plain is-None check — no st.cache_resource lock or hashing on
+# the hot path.
 retriever = get_retriever()
 synthesizer = get_synthesizer()
 
@@ -61,7 +53,9 @@ if st.button("Get Answer"):
     else:
         # This is where the magic happens
         with st.spinner("Step 1/2: Searching the knowledge base..."):
-            retrieved_context = retriever.retrieve_context(user_question)
+            # retrieve_context is async now; drive it on qa_engine's
+            # persistent loop so the driver's pooled connections survive.
+            retrieved_context = run_async(retriever.retrieve_context(user_question))
 
         with st.spinner("Step 2/2: Synthesizing the answer with AI..."):
             final_answer = synthesizer.generate_answer(user_question, retrieved_context)
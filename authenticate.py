@@ -1,4 +1,5 @@
 import os
+from itertools import islice
 from dotenv import load_dotenv
 from github import Github
 
@@ -8,6 +9,9 @@ load_dotenv()
 # Get the token from the environment variable
 GITHUB_TOKEN = os.getenv("GITHUB_TOKEN")
 
+# How many repositories to list as a sanity check.
+REPO_LIMIT = 5
+
 if not GITHUB_TOKEN:
     raise ValueError("GitHub token not found. Please set it in the .env file.")
 
@@ -21,9 +25,12 @@ try:
     print(f"Successfully authenticated as: {user.login}")
     print("-" * 20)
     
-    # Example: List first 5 repositories the user has access to
-    print("First 5 repositories you can access:")
-    for repo in g.get_repos()[:25]:
+    # Example: List the first few repositories the user has access to.
+    # islice stops paginating as soon as REPO_LIMIT items are yielded —
+    # slicing the PaginatedList would keep fetching pages for items we
+    # never print.
+    print(f"First {REPO_LIMIT} repositories you can access:")
+    for repo in islice(g.get_repos(), REPO_LIMIT):
         print(f"- {repo.full_name}")
 
 except Exception as e:
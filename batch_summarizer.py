@@ -0,0 +1,125 @@
+# batch_summarizer.py
+
+import os
+import json
+import time
+from dotenv import load_dotenv
+from openai import OpenAI
+
+# --- Configuration ---
+load_dotenv()
+
+INPUT_FILE = "github_data.jsonl"          # Produced by extractor.py
+BATCH_INPUT_FILE = "batch_requests.jsonl" # The request file uploaded to OpenAI
+OUTPUT_FILE = "pr_summaries.json"         # PR id -> summary text
+MODEL = "gpt-4o-mini"
+POLL_INTERVAL_SECONDS = 60
+
+# The Batch API runs the whole job asynchronously (within 24h) at half the
+# price of synchronous calls — the right trade for bulk, offline
+# summarization of every extracted PR.
+
+try:
+    client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+except Exception as e:
+    print(f"Error initializing OpenAI client: {e}")
+    exit()
+
+SUMMARY_INSTRUCTIONS = (
+    "You are an engineering analyst. Summarize the following GitHub pull "
+    "request in 2-3 sentences: what changed, why, and which technologies "
+    "were involved. Base the summary only on the provided details."
+)
+
+
+def build_batch_requests(input_file, batch_input_file):
+    """Writes one Batch API request line per extracted PR."""
+    count = 0
+    with open(input_file, 'r', encoding='utf-8') as in_f, \
+         open(batch_input_file, 'w', encoding='utf-8') as out_f:
+        for line in in_f:
+            record = json.loads(line)
+            if record.get("record") != "pull_request":
+                continue
+            commit_messages = "\n".join(
+                f"- {c['message'].splitlines()[0]}" for c in record.get("commits", []) if c.get("message")
+            )
+            pr_text = (
+                f"Title: {record['title']}\n"
+                f"Body: {(record.get('body') or '')[:4000]}\n"
+                f"Commits:\n{commit_messages}"
+            )
+            request = {
+                "custom_id": str(record["id"]),
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": {
+                    "model": MODEL,
+                    "messages": [
+                        {"role": "system", "content": SUMMARY_INSTRUCTIONS},
+                        {"role": "user", "content": pr_text},
+                    ],
+                    "temperature": 0.2,
+                },
+            }
+            out_f.write(json.dumps(request, ensure_ascii=False) + "\n")
+            count += 1
+    return count
+
+
+def submit_batch(batch_input_file):
+    """Uploads the request file and creates the batch job."""
+    print(f"Uploading {batch_input_file}...")
+    batch_file = client.files.create(file=open(batch_input_file, "rb"), purpose="batch")
+    batch = client.batches.create(
+        input_file_id=batch_file.id,
+        endpoint="/v1/chat/completions",
+        completion_window="24h",
+    )
+    print(f"Submitted batch job: {batch.id}")
+    return batch.id
+
+
+def wait_for_batch(batch_id):
+    """Polls the batch job until it reaches a terminal state."""
+    while True:
+        batch = client.batches.retrieve(batch_id)
+        print(f"  - Batch {batch_id} status: {batch.status}")
+        if batch.status in ("completed", "failed", "expired", "cancelled"):
+            return batch
+        time.sleep(POLL_INTERVAL_SECONDS)
+
+
+def collect_results(batch, output_file):
+    """Downloads the batch output and writes {pr_id: summary} to disk."""
+    if batch.status != "completed":
+        print(f"Batch did not complete (status: {batch.status}). No results written.")
+        return 0
+
+    content = client.files.content(batch.output_file_id)
+    summaries = {}
+    for line in content.text.splitlines():
+        result = json.loads(line)
+        response = result.get("response") or {}
+        if response.get("status_code") == 200:
+            body = response["body"]
+            summaries[result["custom_id"]] = body["choices"][0]["message"]["content"]
+        else:
+            print(f"  - Request {result.get('custom_id')} failed: {response.get('status_code')}")
+
+    with open(output_file, 'w', encoding='utf-8') as f:
+        json.dump(summaries, f, ensure_ascii=False, indent=4)
+    return len(summaries)
+
+
+if __name__ == "__main__":
+    print(f"Building batch requests from '{INPUT_FILE}'...")
+    request_count = build_batch_requests(INPUT_FILE, BATCH_INPUT_FILE)
+    if request_count == 0:
+        print("No pull requests found. Run 'extractor.py' first.")
+    else:
+        print(f"Prepared {request_count} summarization requests.")
+        batch_id = submit_batch(BATCH_INPUT_FILE)
+        batch = wait_for_batch(batch_id)
+        written = collect_results(batch, OUTPUT_FILE)
+        print(f"\nWrote {written} PR summaries to '{OUTPUT_FILE}'.")
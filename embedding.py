@@ -0,0 +1,90 @@
+# embedding.py
+
+import os
+import numpy as np
+import torch
+from sentence_transformers import SentenceTransformer
+
+# A fast and effective open-source model; shared by the vector loader and
+# the QA engine so both sides of the pipeline embed identically.
+MODEL_NAME = 'all-MiniLM-L6-v2'
+
+# Where export_onnx.py writes the converted model. If the INT8 file exists,
+# load_query_encoder prefers it for per-query encoding.
+ONNX_DIR = "onnx_model"
+ONNX_INT8_MODEL = os.path.join(ONNX_DIR, "model-int8.onnx")
+
+
+def load_embedding_model(model_name=MODEL_NAME):
+    """Loads the SentenceTransformer on the fastest available backend.
+
+    On CUDA the weights are cast to FP16 (Tensor Core matmuls, ~2x) and the
+    underlying transformer is wrapped with torch.compile so attention/LN/MLP
+    kernels get fused. On CPU the model is returned as-is — encoding is the
+    hot path in both the bulk loader and per-query search, so this is worth
+    doing once here rather than per caller.
+    """
+    device = 'cuda' if torch.cuda.is_available() else 'cpu'
+    print(f"Loading embedding model '{model_name}' on {device}...")
+    model = SentenceTransformer(model_name, device=device)
+    if device == 'cuda':
+        model.half()
+        try:
+            model[0].auto_model = torch.compile(model[0].auto_model, mode='reduce-overhead')
+        except Exception as e:
+            # torch.compile needs a working inductor backend; fall back
+            # silently to eager FP16 if it isn't available.
+            print(f"torch.compile unavailable ({e}); using eager FP16 model.")
+    return model
+
+
+class OnnxEncoder:
+    """Drop-in replacement for SentenceTransformer.encode backed by an
+    INT8-quantized ONNX Runtime session (see export_onnx.py).
+
+    Runs the same pipeline MiniLM uses in sentence-transformers — tokenize,
+    transformer forward, attention-masked mean pooling, L2 normalization —
+    so the vectors are interchangeable with the ones stored at ingest time.
+    """
+
+    def __init__(self, model_dir=ONNX_DIR, model_file=ONNX_INT8_MODEL):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        self.session = ort.InferenceSession(
+            model_file, providers=['CUDAExecutionProvider', 'CPUExecutionProvider']
+        )
+        self._input_names = {i.name for i in self.session.get_inputs()}
+
+    def encode(self, texts, **_kwargs):
+        single = isinstance(texts, str)
+        if single:
+            texts = [texts]
+
+        encoded = self.tokenizer(
+            texts, padding=True, truncation=True, max_length=256, return_tensors="np"
+        )
+        outputs = self.session.run(
+            None, {k: v for k, v in encoded.items() if k in self._input_names}
+        )
+        token_embeddings = outputs[0]
+
+        # Mean pooling over real (non-padding) tokens, then L2 normalize —
+        # identical to the model's Pooling + Normalize modules.
+        mask = encoded["attention_mask"][:, :, None].astype(token_embeddings.dtype)
+        embeddings = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        embeddings = embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+        return embeddings[0] if single else embeddings
+
+
+def load_query_encoder():
+    """Returns the fastest available encoder for per-query embedding.
+
+    Prefers the INT8 ONNX model when export_onnx.py has been run, otherwise
+    falls back to the regular SentenceTransformer.
+    """
+    if os.path.exists(ONNX_INT8_MODEL):
+        print(f"Loading INT8 ONNX encoder from '{ONNX_INT8_MODEL}'...")
+        return OnnxEncoder()
+    return load_embedding_model()
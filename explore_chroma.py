@@ -1,11 +1,30 @@
 import chromadb
+from functools import lru_cache
 from pprint import pprint
+from sentence_transformers import SentenceTransformer
 
 # --- Configuration ---
 CHROMA_PATH = "chroma_db"
 COLLECTION_NAME = "github_knowledge_base"
+MODEL_NAME = 'all-MiniLM-L6-v2'  # Same model the loader used for ingestion
 
-def explore_vector_db():
+# One model instance for the whole process; loading it per query would
+# dwarf the query itself.
+embedding_model = SentenceTransformer(MODEL_NAME)
+
+@lru_cache(maxsize=1024)
+def embed(text):
+    """Embeds a query string, memoized so repeat queries skip the encoder."""
+    return tuple(embedding_model.encode(text).tolist())
+
+# How many results we actually print below. Asking Chroma for more than we
+# consume just costs extra HNSW traversal.
+N_RESULTS = 3
+
+def explore_vector_db(where=None):
+    """Pokes around the collection. Pass a `where` dict (e.g.
+    {"author": "mchill"}) to have Chroma filter candidates server-side
+    instead of post-filtering in Python."""
     print("Connecting to ChromaDB...")
     client = chromadb.PersistentClient(path=CHROMA_PATH)
     collection = client.get_collection(name=COLLECTION_NAME)
@@ -26,12 +45,16 @@ def explore_vector_db():
     query = "web components and custom elements"
     print(f"Query: '{query}'")
 
+    # Pass a client-side embedding instead of query_texts so Chroma doesn't
+    # re-embed the text on every call — the cached vector is reused for
+    # repeat queries.
     results = collection.query(
-        query_texts=[query],
-        n_results=10 # Ask for the top 3 most similar results
+        query_embeddings=[list(embed(query))],
+        n_results=N_RESULTS, # Only ask for as many results as we display
+        where=where
     )
 
-    print("\nTop 3 semantic search results:")
+    print(f"\nTop {N_RESULTS} semantic search results:")
     for i, doc_id in enumerate(results['ids'][0]):
         distance = results['distances'][0][i]
         document = results['documents'][0][i]
@@ -0,0 +1,32 @@
+# export_onnx.py
+
+import os
+from optimum.onnxruntime import ORTModelForFeatureExtraction
+from transformers import AutoTokenizer
+from onnxruntime.quantization import quantize_dynamic, QuantType
+
+from embedding import MODEL_NAME, ONNX_DIR, ONNX_INT8_MODEL
+
+# One-off export: converts the MiniLM encoder to ONNX and dynamically
+# quantizes the weights to INT8. qa_engine picks up the quantized model
+# automatically (see embedding.load_query_encoder) — on modern CPUs the
+# INT8 kernels use VNNI dot products, roughly halving per-query latency on
+# top of the ONNX Runtime speedup.
+
+if __name__ == "__main__":
+    hf_model_name = f"sentence-transformers/{MODEL_NAME}"
+
+    print(f"Exporting '{hf_model_name}' to ONNX in '{ONNX_DIR}'...")
+    model = ORTModelForFeatureExtraction.from_pretrained(hf_model_name, export=True)
+    model.save_pretrained(ONNX_DIR)
+
+    tokenizer = AutoTokenizer.from_pretrained(hf_model_name)
+    tokenizer.save_pretrained(ONNX_DIR)
+
+    print("Quantizing weights to INT8...")
+    quantize_dynamic(
+        os.path.join(ONNX_DIR, "model.onnx"),
+        ONNX_INT8_MODEL,
+        weight_type=QuantType.QInt8,
+    )
+    print(f"Done. Quantized model written to '{ONNX_INT8_MODEL}'.")
@@ -2,9 +2,12 @@
 
 import os
 import time
-import json
+import orjson
+import asyncio
+import hashlib
+import aiohttp
+import requests
 from dotenv import load_dotenv
-from github import Github, RateLimitExceededException, UnknownObjectException
 from pprint import pprint
 
 # --- Configuration ---
@@ -17,131 +20,325 @@ TARGET_REPO_FULL_NAME = "OvidijusParsiunas/deep-chat"
 
 # Set a limit for the number of PRs to fetch for testing purposes.
 # Set to None to fetch all. Be aware this can take a long time for large repos.
-MAX_PRS_TO_FETCH = 25 
+MAX_PRS_TO_FETCH = 25
+
+GITHUB_GRAPHQL_URL = "https://api.github.com/graphql"
+GITHUB_REST_URL = "https://api.github.com/repos"
+
+# How many PRs to request per GraphQL page. Each page returns the PR metadata,
+# comments, and commit list in ONE roundtrip instead of 4-6 REST calls per PR.
+PRS_PER_PAGE = 50
+
+# How many commit-file REST requests to keep in flight at once. The per-commit
+# fetches are pure network I/O, so running them concurrently turns the
+# dominant cost of a page from sum(commits) into roughly max(commits).
+MAX_CONCURRENT_REQUESTS = 15
+
+# Back off when this few requests remain in the rate-limit budget.
+RATE_LIMIT_FLOOR = 50
+
+# On-disk cache for REST responses. We store each response body alongside
+# its ETag and send If-None-Match on re-runs; GitHub answers 304 for
+# unchanged resources WITHOUT counting the request against the rate limit,
+# so re-extracting a repo only pays for commits we haven't seen before.
+ETAG_CACHE_DIR = "etag_cache"
+ETAG_INDEX_FILE = os.path.join(ETAG_CACHE_DIR, "etags.json")
+
+
+def _load_etag_index():
+    try:
+        with open(ETAG_INDEX_FILE, 'rb') as f:
+            return orjson.loads(f.read())
+    except (FileNotFoundError, orjson.JSONDecodeError):
+        return {}
+
+_etag_index = _load_etag_index()
+
+def _cached_body_path(url):
+    return os.path.join(ETAG_CACHE_DIR, hashlib.sha1(url.encode()).hexdigest() + ".json")
+
+def _read_cached_body(url):
+    try:
+        with open(_cached_body_path(url), 'rb') as f:
+            return orjson.loads(f.read())
+    except (FileNotFoundError, orjson.JSONDecodeError):
+        return None
+
+def _store_cached_body(url, etag, body):
+    os.makedirs(ETAG_CACHE_DIR, exist_ok=True)
+    with open(_cached_body_path(url), 'wb') as f:
+        f.write(orjson.dumps(body))
+    if etag:
+        _etag_index[url] = etag
+
+def _save_etag_index():
+    os.makedirs(ETAG_CACHE_DIR, exist_ok=True)
+    with open(ETAG_INDEX_FILE, 'wb') as f:
+        f.write(orjson.dumps(_etag_index))
 
 if not GITHUB_TOKEN:
     print("Warning: GitHub token not found. Running with lower API rate limits.")
-# --- Authentication ---
-# Even for public repos, authenticating gives you a much higher rate limit (5000 req/hr vs 60)
-g = Github(GITHUB_TOKEN)
-print(f"Successfully authenticated with GitHub.")
+
+HEADERS = {"Authorization": f"bearer {GITHUB_TOKEN}"} if GITHUB_TOKEN else {}
 
 
 # --- Helper function for rate limiting ---
-def wait_for_rate_limit_reset(github_instance):
-    """Waits for the GitHub API rate limit to reset."""
-    core_rate_limit = github_instance.get_rate_limit().core
-    reset_seconds = (core_rate_limit.reset - datetime.datetime.utcnow()).total_seconds()
-    sleep_time = max(0, reset_seconds) + 5  # Add 5 seconds buffer
+def wait_for_rate_limit_reset(response):
+    """Waits until the GitHub API rate limit window resets."""
+    reset_at = int(response.headers.get("X-RateLimit-Reset", time.time() + 60))
+    sleep_time = max(0, reset_at - time.time()) + 5  # Add 5 seconds buffer
     print(f"Rate limit exceeded. Waiting for {sleep_time:.2f} seconds...")
     time.sleep(sleep_time)
 
-# --- Data Extraction Functions (Modified for a single repo) ---
 
-def get_target_repo(github_instance, repo_full_name):
-    """Fetches a single repository object by its full name."""
-    print(f"\nFetching repository: {repo_full_name}")
-    try:
-        repo = github_instance.get_repo(repo_full_name)
-        print(f"Successfully found repository: {repo.full_name}")
-        return repo
-    except UnknownObjectException:
-        print(f"Error: Repository '{repo_full_name}' not found. Please check the name.")
-        return None
-    except RateLimitExceededException:
-        wait_for_rate_limit_reset(github_instance)
-        return get_target_repo(github_instance, repo_full_name) # Retry
-    except Exception as e:
-        print(f"An unexpected error occurred: {e}")
-        return None
+def run_graphql_query(query, variables):
+    """Posts a GraphQL query, retrying once after a rate-limit wait."""
+    response = requests.post(
+        GITHUB_GRAPHQL_URL,
+        json={"query": query, "variables": variables},
+        headers=HEADERS,
+    )
+    if response.status_code == 403 and response.headers.get("X-RateLimit-Remaining") == "0":
+        wait_for_rate_limit_reset(response)
+        response = requests.post(
+            GITHUB_GRAPHQL_URL,
+            json={"query": query, "variables": variables},
+            headers=HEADERS,
+        )
+    response.raise_for_status()
+    payload = response.json()
+    if "errors" in payload:
+        raise RuntimeError(f"GraphQL query failed: {payload['errors']}")
+    return payload["data"]
+
+
+# One query fetches the repo metadata plus a full page of merged PRs with
+# their comments and commits. This collapses the old one-REST-call-per-PR
+# (plus per-commit-list, per-comment-list) pattern into O(pages) roundtrips.
+REPO_PULL_REQUESTS_QUERY = """
+query($owner: String!, $name: String!, $pageSize: Int!, $cursor: String) {
+  repository(owner: $owner, name: $name) {
+    name
+    nameWithOwner
+    description
+    url
+    primaryLanguage { name }
+    repositoryTopics(first: 20) { nodes { topic { name } } }
+    pullRequests(states: MERGED, orderBy: {field: UPDATED_AT, direction: DESC},
+                 first: $pageSize, after: $cursor) {
+      pageInfo { endCursor hasNextPage }
+      nodes {
+        databaseId
+        number
+        title
+        body
+        state
+        url
+        createdAt
+        mergedAt
+        author { login }
+        reviewRequests(first: 20) {
+          nodes { requestedReviewer { ... on User { login } } }
+        }
+        comments(first: 100) {
+          nodes { author { login } body createdAt }
+        }
+        commits(first: 100) {
+          nodes { commit { oid message author { name email date } } }
+        }
+      }
+    }
+  }
+}
+"""
+
+
+async def fetch_commit_files(session, semaphore, repo_full_name, sha):
+    """Fetches the files (with patches) for one commit via the REST API.
 
-def extract_pull_requests(repo, max_prs):
-    """Extracts detailed information from closed pull requests in a repository."""
-    print(f"\nExtracting Pull Requests for repo: {repo.name}")
-    pr_data = []
-    # We get 'closed' PRs because they represent completed work.
-    pull_requests = repo.get_pulls(state='closed', sort='updated', direction='desc')
-
-    # Use the max_prs limit if it's set
-    pr_iterator = pull_requests[:max_prs] if max_prs is not None else pull_requests
-    
-    for pr in pr_iterator:
-        if not pr.merged:
-            continue
-            
-        print(f"  - Processing PR #{pr.number}: {pr.title}")
+    The GraphQL API does not expose per-file diffs, so this is the one piece
+    that still goes through REST. Runs under a shared semaphore so at most
+    MAX_CONCURRENT_REQUESTS are in flight, and backs off when the shared
+    rate-limit budget runs low.
+    """
+    url = f"{GITHUB_REST_URL}/{repo_full_name}/commits/{sha}"
+    cached_body = _read_cached_body(url)
+    request_headers = dict(HEADERS)
+    if cached_body is not None and url in _etag_index:
+        request_headers["If-None-Match"] = _etag_index[url]
+
+    async with semaphore:
         try:
-            # 1. Basic PR Info
-            pr_info = {
-                "id": pr.id, "number": pr.number, "title": pr.title, "body": pr.body,
-                "state": pr.state, "url": pr.html_url, "created_at": pr.created_at.isoformat(),
-                "merged_at": pr.merged_at.isoformat() if pr.merged_at else None,
-                "author": pr.user.login if pr.user else "N/A",
-                "reviewers": [r.login for r in pr.requested_reviewers],
+            while True:
+                async with session.get(url, headers=request_headers) as response:
+                    if response.status == 304:
+                        # Unchanged since last run — free against the rate limit.
+                        body = cached_body
+                        break
+                    remaining = int(response.headers.get("X-RateLimit-Remaining", RATE_LIMIT_FLOOR + 1))
+                    if response.status == 403 and remaining == 0 or remaining < RATE_LIMIT_FLOOR:
+                        reset_at = int(response.headers.get("X-RateLimit-Reset", time.time() + 60))
+                        sleep_time = max(0, reset_at - time.time()) + 5
+                        print(f"Rate limit low. Waiting for {sleep_time:.2f} seconds...")
+                        await asyncio.sleep(sleep_time)
+                        if response.status == 403:
+                            continue
+                    response.raise_for_status()
+                    body = await response.json()
+                    _store_cached_body(url, response.headers.get("ETag"), body)
+                    break
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            # One bad sha (a 404/422, or a secondary-rate-limit 403 that
+            # still shows budget remaining) must not sink the whole
+            # extraction — degrade to an empty file list and keep going,
+            # like the per-PR error handling always has.
+            print(f"  - Warning: could not fetch files for commit {sha}: {e}")
+            return sha, []
+    return sha, [{
+        "filename": f["filename"], "status": f["status"], "additions": f["additions"],
+        "deletions": f["deletions"], "patch": f.get("patch")  # The actual code diff
+    } for f in body.get("files", [])]
+
+
+async def fetch_files_for_shas(repo_full_name, shas):
+    """Fetches files for many commits concurrently; returns {sha: files}."""
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+    async with aiohttp.ClientSession() as session:
+        results = await asyncio.gather(*[
+            fetch_commit_files(session, semaphore, repo_full_name, sha)
+            for sha in shas
+        ])
+    _save_etag_index()
+    return dict(results)
+
+
+def build_pr_info(repo_full_name, pr_node, files_by_sha):
+    """Maps a GraphQL PR node into the pr_info dict shape used downstream."""
+    pr_info = {
+        "id": pr_node["databaseId"], "number": pr_node["number"],
+        "title": pr_node["title"], "body": pr_node["body"],
+        "state": pr_node["state"].lower(), "url": pr_node["url"],
+        "created_at": pr_node["createdAt"],
+        "merged_at": pr_node["mergedAt"],
+        "author": pr_node["author"]["login"] if pr_node["author"] else "N/A",
+        "reviewers": [
+            rr["requestedReviewer"]["login"]
+            for rr in pr_node["reviewRequests"]["nodes"]
+            if rr["requestedReviewer"]
+        ],
+    }
+
+    pr_info["comments"] = [{
+        "author": c["author"]["login"] if c["author"] else "N/A",
+        "body": c["body"], "created_at": c["createdAt"]
+    } for c in pr_node["comments"]["nodes"]]
+
+    pr_info["commits"] = []
+    for commit_node in pr_node["commits"]["nodes"]:
+        commit = commit_node["commit"]
+        author = commit.get("author") or {}
+        pr_info["commits"].append({
+            "sha": commit["oid"],
+            "author": author.get("name") or "N/A",
+            "email": author.get("email") or "N/A",
+            "message": commit["message"],
+            "committed_at": author.get("date"),
+            "files": files_by_sha.get(commit["oid"], []),
+        })
+    return pr_info
+
+
+def extract_repository(repo_full_name, max_prs, output_filename="github_data.jsonl"):
+    """Extracts repo metadata and all merged PRs via paginated GraphQL calls.
+
+    PRs are streamed to a JSONL file as they are extracted instead of being
+    accumulated in memory: the first line holds the repo metadata, then one
+    line per PR. This keeps memory flat regardless of repo size and means a
+    crashed/rate-limited run still leaves usable partial data on disk.
+    """
+    owner, name = repo_full_name.split("/")
+    repo_info = None
+    first_pr = None
+    pr_count = 0
+    cursor = None
+    out_f = None
+
+    while True:
+        page_size = PRS_PER_PAGE
+        if max_prs is not None:
+            page_size = min(page_size, max_prs - pr_count)
+        data = run_graphql_query(REPO_PULL_REQUESTS_QUERY, {
+            "owner": owner, "name": name, "pageSize": page_size, "cursor": cursor,
+        })
+        repository = data["repository"]
+        if repository is None:
+            print(f"Error: Repository '{repo_full_name}' not found. Please check the name.")
+            return None, 0, None
+
+        if repo_info is None:
+            repo_info = {
+                "name": repository["name"],
+                "full_name": repository["nameWithOwner"],
+                "description": repository["description"],
+                "language": repository["primaryLanguage"]["name"] if repository["primaryLanguage"] else None,
+                "topics": [t["topic"]["name"] for t in repository["repositoryTopics"]["nodes"]],
+                "url": repository["url"],
             }
+            print(f"Successfully found repository: {repo_info['full_name']}")
+            print(f"\nExtracting Pull Requests for repo: {repo_info['name']}")
+            out_f = open(output_filename, 'wb')
+            out_f.write(orjson.dumps({"record": "repo", **repo_info}) + b"\n")
+            out_f.flush()
+
+        pr_page = repository["pullRequests"]
+
+        # Fetch the file diffs for every commit on this page concurrently.
+        page_shas = {
+            commit_node["commit"]["oid"]
+            for pr_node in pr_page["nodes"]
+            for commit_node in pr_node["commits"]["nodes"]
+        }
+        print(f"  - Fetching diffs for {len(page_shas)} commits concurrently...")
+        files_by_sha = asyncio.run(fetch_files_for_shas(repo_full_name, page_shas))
+
+        for pr_node in pr_page["nodes"]:
+            print(f"  - Processing PR #{pr_node['number']}: {pr_node['title']}")
+            try:
+                pr_info = build_pr_info(repo_full_name, pr_node, files_by_sha)
+            except Exception as e:
+                print(f"  - Could not fully process PR #{pr_node['number']}. Error: {e}")
+                continue
+            out_f.write(orjson.dumps({"record": "pull_request", **pr_info}) + b"\n")
+            out_f.flush()
+            pr_count += 1
+            if first_pr is None:
+                first_pr = pr_info
+
+        if not pr_page["pageInfo"]["hasNextPage"]:
+            break
+        if max_prs is not None and pr_count >= max_prs:
+            break
+        cursor = pr_page["pageInfo"]["endCursor"]
+
+    out_f.close()
+    return repo_info, pr_count, first_pr
 
-            # 2. Extract Comments
-            pr_info["comments"] = [{
-                "author": c.user.login if c.user else "N/A", "body": c.body, "created_at": c.created_at.isoformat()
-            } for c in pr.get_issue_comments()]
-            
-            # 3. Extract Commits and File Diffs
-            pr_info["commits"] = []
-            for commit in pr.get_commits():
-                files_changed = [{
-                    "filename": f.filename, "status": f.status, "additions": f.additions,
-                    "deletions": f.deletions, "patch": f.patch # The actual code diff
-                } for f in commit.files]
-
-                pr_info["commits"].append({
-                    "sha": commit.sha,
-                    "author": commit.commit.author.name if commit.commit.author else "N/A",
-                    "email": commit.commit.author.email if commit.commit.author else "N/A",
-                    "message": commit.commit.message,
-                    "committed_at": commit.commit.author.date.isoformat(),
-                    "files": files_changed
-                })
-            
-            pr_data.append(pr_info)
-        
-        except RateLimitExceededException:
-            wait_for_rate_limit_reset(g)
-            print(f"  - Retrying PR #{pr.number} after rate limit wait.")
-            # Simple retry logic here, more robust would be needed for a production system
-            continue
-        except Exception as e:
-            print(f"  - Could not fully process PR #{pr.number}. Error: {e}")
-
-    return pr_data
 
 # --- Main Execution Logic ---
 if __name__ == "__main__":
-    repo = get_target_repo(g, TARGET_REPO_FULL_NAME)
-    
-    if repo:
-        repo_info = {
-            "name": repo.name, "full_name": repo.full_name, "description": repo.description,
-            "language": repo.language, "topics": repo.get_topics(), "url": repo.html_url,
-        }
-        
-        # Get PR data and add it to our repo info
-        repo_info["pull_requests"] = extract_pull_requests(repo, MAX_PRS_TO_FETCH)
-        
-        # We wrap the single repo_info in a list to maintain the same data structure as before
-        knowledge_base_data = [repo_info]
+    output_filename = "github_data.jsonl"
+    repo_info, pr_count, first_pr = extract_repository(
+        TARGET_REPO_FULL_NAME, MAX_PRS_TO_FETCH, output_filename
+    )
 
+    if repo_info:
         print("\n\n--- EXTRACTION COMPLETE ---")
-        print(f"Extracted {len(repo_info['pull_requests'])} PRs from '{repo.full_name}'.")
-        
-        output_filename = "github_data.json"
-        with open(output_filename, 'w', encoding='utf-8') as f:
-            json.dump(knowledge_base_data, f, ensure_ascii=False, indent=4)
-            
+        print(f"Extracted {pr_count} PRs from '{repo_info['full_name']}'.")
         print(f"Raw data saved to {output_filename}")
-        
+
         # Optional: Print a snippet of the data
-        if knowledge_base_data and knowledge_base_data[0]["pull_requests"]:
+        if first_pr:
             print("\n--- Sample of extracted data (first PR) ---")
-            pprint(knowledge_base_data[0]["pull_requests"][0])
+            pprint(first_pr)
         else:
-            print("No merged pull requests found or extracted.")
\ No newline at end of file
+            print("No merged pull requests found or extracted.")
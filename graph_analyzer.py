@@ -1,6 +1,10 @@
 # graph_analyzer.py
 
 import os
+import time
+import atexit
+import threading
+import httpx
 from dotenv import load_dotenv
 from neo4j import GraphDatabase
 from openai import OpenAI
@@ -9,12 +13,31 @@ from openai import OpenAI
 load_dotenv()
 
 # Initialize OpenAI Client (can be swapped for Gemini)
+# The synthesis calls run from the router's worker threads, so the client
+# stays synchronous; a pooled httpx client reuses keep-alive connections
+# across calls instead of opening a fresh TLS session each time.
 try:
-    openai_client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    _http_client = httpx.Client(limits=httpx.Limits(max_keepalive_connections=20))
+    openai_client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"), http_client=_http_client)
 except Exception as e:
     print(f"Error initializing OpenAI client: {e}")
     exit()
 
+# Stable synthesis instructions. Kept identical across calls (and out of the
+# per-call user message) so the long prefix is eligible for OpenAI's
+# server-side prompt caching — cheaper input tokens and faster first token.
+SYNTHESIS_INSTRUCTIONS = """You are a helpful engineering knowledge assistant and an expert engineering analyst for a GitHub-based knowledge base.
+
+You will be given a CONTEXT block retrieved from the knowledge base, followed by a user QUESTION. The context contains facts such as ranked technology contribution counts, commit messages, and lists of contributors.
+
+Follow these rules when answering:
+- Base your answer *only* on the provided context. Do not use outside knowledge and do not make up information.
+- If the context does not contain enough information to answer the question, say so plainly.
+- Answer in a clear, concise summary, leading with the most relevant finding.
+- When the context ranks people or technologies by contribution count, preserve that ranking in your answer.
+- Cite the supporting evidence from the context (e.g. contribution counts or commit messages) for each claim you make.
+"""
+
 class GraphAnalyzer:
     """
     A class to answer structured questions starting from the Neo4j graph.
@@ -32,24 +55,15 @@ class GraphAnalyzer:
         """A helper function to call the LLM for synthesis."""
         if not context:
             return "I could not find any data in the knowledge base for this query."
-            
-        full_prompt = f"""
-        You are an expert engineering analyst. Based *only* on the provided context below, answer the user's question in a clear, concise summary.
-
-        CONTEXT:
-        ---
-        {context}
-        ---
-
-        QUESTION: {prompt}
 
-        ANSWER:
-        """
+        # The instructions live in SYNTHESIS_INSTRUCTIONS (a byte-identical
+        # system message on every call) so OpenAI's server-side prompt cache
+        # can reuse that prefix; only the context + question vary per call.
         response = openai_client.chat.completions.create(
             model="gpt-4o-mini",
             messages=[
-                {"role": "system", "content": "You are a helpful engineering knowledge assistant."},
-                {"role": "user", "content": full_prompt}
+                {"role": "system", "content": SYNTHESIS_INSTRUCTIONS},
+                {"role": "user", "content": f"CONTEXT:\n---\n{context}\n---\n\nQUESTION: {prompt}\n\nANSWER:"}
             ],
             temperature=0.2
         )
@@ -64,46 +78,50 @@ class GraphAnalyzer:
         question = f"What expertise does user '{user_id}' have?"
         
         with self.graph_driver.session() as session:
-            # This query gets two things:
+            # A single fused query that returns ONE row:
             # 1. A ranked list of technologies the user contributed to.
             # 2. A sample of their recent commit messages for more narrative context.
+            # The old two-CALL version produced a Cartesian product where the
+            # commit list was duplicated across every technology row.
             result = session.run("""
             MATCH (u:User {id: $user_id})
-            
-            // Get ranked technology contributions
-            CALL {
-                WITH u
-                MATCH (u)-[r:CONTRIBUTED_TO_TECHNOLOGY]->(t:Technology)
-                RETURN t.name AS technology, count(r) AS contribution_count
-                ORDER BY contribution_count DESC
-            }
-            
-            // Get recent commit messages
-            CALL {
-                WITH u
-                MATCH (u)-[:AUTHORED]->(:PullRequest)-[:INCLUDES]->(c:Commit)
-                RETURN COLLECT(c.message)[..10] AS recent_commits // Get up to 10 recent messages
-            }
-            
-            RETURN technology, contribution_count, recent_commits
+
+            // Aggregate ranked technology contributions into one list.
+            // The processor emits ONE edge per (user, technology) pair and
+            // records how many (commit, file) occurrences it collapsed in
+            // r.occurrences — so rank by that, not by counting edges
+            // (which would always be 1). coalesce covers graphs loaded
+            // before the property existed.
+            OPTIONAL MATCH (u)-[r:CONTRIBUTED_TO_TECHNOLOGY]->(t:Technology)
+            WITH u, t.name AS technology, sum(coalesce(r.occurrences, 1)) AS contribution_count
+            ORDER BY contribution_count DESC
+            WITH u, collect({technology: technology, contribution_count: contribution_count}) AS techs
+
+            // Get recent commit messages once. DISTINCT because the same
+            // commit can be reachable through several of the user's PRs,
+            // which would otherwise repeat its message in the sample.
+            OPTIONAL MATCH (u)-[:AUTHORED]->(:PullRequest)-[:INCLUDES]->(c:Commit)
+            RETURN techs, collect(DISTINCT c.message)[..10] AS recent_commits // Get up to 10 recent messages
             """, user_id=user_id)
-            
+
             # Format the context for the LLM
-            context_str = ""
-            records = [record.data() for record in result]
-            if not records:
+            record = result.single()
+            if record is None:
                 return "No data found for this user."
-            
-            context_str += "Ranked Technology Contributions:\n"
-            for record in records:
-                if record['technology']:
-                    context_str += f"- {record['technology']}: {record['contribution_count']} contributions\n"
 
-            # Add commit messages (they will be duplicated, so we just take the first list)
-            if records[0]['recent_commits']:
-                context_str += "\nSample of recent commit messages:\n"
-                for msg in records[0]['recent_commits']:
-                    context_str += f"- {msg.strip()}\n"
+            # Collect lines and join once — += on a string re-copies the
+            # whole context for every technology appended.
+            parts = ["Ranked Technology Contributions:"]
+            for tech in record['techs']:
+                if tech['technology']:
+                    parts.append(f"- {tech['technology']}: {tech['contribution_count']} contributions")
+
+            if record['recent_commits']:
+                parts.append("\nSample of recent commit messages:")
+                for msg in record['recent_commits']:
+                    parts.append(f"- {msg.strip()}")
+
+            context_str = "\n".join(parts)
 
         print("  - Context retrieved from graph. Synthesizing answer...")
         return self._synthesize_answer(question, context_str)
@@ -117,22 +135,25 @@ class GraphAnalyzer:
         question = f"Who are all the users who have expertise in technology '{technology_name}'?"
 
         with self.graph_driver.session() as session:
-            # This query finds all users connected to a technology and ranks them.
+            # This query finds all users connected to a technology and ranks
+            # them. As above: one deduplicated edge per (user, technology),
+            # so the rank comes from its occurrences property, not count(r).
             result = session.run("""
             MATCH (u:User)-[r:CONTRIBUTED_TO_TECHNOLOGY]->(t:Technology {name: $tech_name})
-            RETURN u.id as user, count(r) as contribution_count
+            RETURN u.id as user, sum(coalesce(r.occurrences, 1)) as contribution_count
             ORDER BY contribution_count DESC
             LIMIT 10 // Limit to the top 10 experts
             """, tech_name=technology_name)
 
             # Format the context for the LLM
-            context_str = f"List of users who contributed to {technology_name}, ranked by number of contributions:\n"
             records = [record.data() for record in result]
             if not records:
                 return f"No users found with contributions to '{technology_name}'."
-            
+
+            parts = [f"List of users who contributed to {technology_name}, ranked by number of contributions:"]
             for record in records:
-                context_str += f"- User: {record['user']}, Contributions: {record['contribution_count']}\n"
+                parts.append(f"- User: {record['user']}, Contributions: {record['contribution_count']}")
+            context_str = "\n".join(parts)
         
         print("  - Context retrieved from graph. Synthesizing answer...")
         return self._synthesize_answer(question, context_str)
@@ -142,20 +163,65 @@ class GraphAnalyzer:
 # graph_analyzer.py (Refactored for Router)
 # ... (all imports and class definitions remain the same) ...
 
+# A single shared analyzer so the router reuses the Neo4j driver's connection
+# pool instead of paying for a new driver + verify_connectivity() on every
+# tool call. Lazily created because just importing this module (e.g. from
+# ai_app.py) shouldn't require a live database.
+_analyzer_singleton = None
+_analyzer_lock = threading.Lock()
+
+def _get_analyzer():
+    """Returns the shared GraphAnalyzer, creating it on first use."""
+    global _analyzer_singleton
+    if _analyzer_singleton is None:
+        with _analyzer_lock:
+            if _analyzer_singleton is None:
+                _analyzer_singleton = GraphAnalyzer()
+                atexit.register(_analyzer_singleton.graph_driver.close)
+    return _analyzer_singleton
+
+# Response cache for the tool wrappers. Both tools are deterministic for a
+# given graph, and the graph only changes when loader_graph.py is re-run, so
+# a repeat question can skip the Cypher roundtrip AND the gpt-4o-mini
+# synthesis call entirely. Entries expire after an hour to pick up reloads.
+_ANSWER_CACHE_TTL_SECONDS = 3600
+_answer_cache = {}
+_answer_cache_lock = threading.Lock()
+
+def _cached_tool_call(tool_name, compute, *args):
+    """Returns a cached answer for (tool_name, args), computing it on a miss."""
+    key = (tool_name,) + args
+    now = time.time()
+    with _answer_cache_lock:
+        cached = _answer_cache.get(key)
+        if cached is not None and now - cached[0] < _ANSWER_CACHE_TTL_SECONDS:
+            print(f"  - Cache hit for {tool_name}{args}, skipping graph + LLM calls.")
+            return cached[1]
+    answer = compute(*args)
+    with _answer_cache_lock:
+        _answer_cache[key] = (now, answer)
+    return answer
+
 # NEW: Top-level functions for the router to call
 def get_user_expertise(user_id: str):
     """
     Finds and summarizes the expertise of a specific user.
     """
-    analyzer = GraphAnalyzer()
-    return analyzer.get_user_expertise(user_id)
+    return _cached_tool_call(
+        "get_user_expertise",
+        lambda uid: _get_analyzer().get_user_expertise(uid),
+        user_id,
+    )
 
 def get_experts_for_technology(technology_name: str):
     """
     Finds all users who have expertise in a given technology.
     """
-    analyzer = GraphAnalyzer()
-    return analyzer.get_experts_for_technology(technology_name)
+    return _cached_tool_call(
+        "get_experts_for_technology",
+        lambda tech: _get_analyzer().get_experts_for_technology(tech),
+        technology_name,
+    )
 
 # The rest of the file (class definitions) stays the same.
 # Make sure the old `if __name__ == "__main__"` block is removed.
@@ -1,6 +1,7 @@
 # loader_graph.py
 import os
-import json
+import orjson
+from collections import defaultdict
 from dotenv import load_dotenv
 from neo4j import GraphDatabase
 
@@ -9,43 +10,75 @@ load_dotenv()
 URI = os.getenv("NEO4J_URI")
 AUTH = (os.getenv("NEO4J_USER"), os.getenv("NEO4J_PASSWORD"))
 
+# How many nodes/edges to send per query. Keeps transactions a sane size.
+BATCH_SIZE = 10000
+
+def create_indexes(driver):
+    """Creates the id lookup index before any data is loaded.
+
+    Every node gets a shared :Entity base label (see load_nodes) with a
+    unique id, so both the MERGE in load_nodes and the MATCHes in
+    load_edges become O(1) index lookups instead of full store scans —
+    without this, edge loading is O(edges * nodes).
+    """
+    print("Creating :Entity(id) uniqueness constraint...")
+    with driver.session() as session:
+        session.run("""
+        CREATE CONSTRAINT entity_id IF NOT EXISTS
+        FOR (n:Entity) REQUIRE n.id IS UNIQUE
+        """)
+
 def load_nodes(driver, nodes_data):
-    """Loads nodes into Neo4j, using MERGE to avoid duplicates."""
+    """Loads nodes into Neo4j, using MERGE to avoid duplicates.
+
+    Nodes are grouped by label on the Python side so each query uses a
+    static label. That removes the per-row apoc.create.addLabels procedure
+    call and lets Neo4j cache one plan (and use one index) per label.
+    """
     print(f"Loading {len(nodes_data)} nodes...")
+    by_label = defaultdict(list)
+    for node in nodes_data:
+        by_label[node["label"]].append({"id": node["id"], "properties": node["properties"]})
+
     with driver.session() as session:
-        # This query is now corrected with the required WITH clause.
-        # It's also slightly optimized to use a single SET.
-        result = session.run("""
-        UNWIND $nodes AS node_data
-        MERGE (n {id: node_data.id})
-        SET n += node_data.properties
-        WITH n, node_data
-        CALL apoc.create.addLabels(n, [node_data.label]) YIELD node
-        RETURN count(node)
-        """, nodes=nodes_data)
-        count = result.single()[0]
-        print(f"Successfully merged {count} nodes.")
+        for label, batch in by_label.items():
+            for i in range(0, len(batch), BATCH_SIZE):
+                # MERGE on :Entity so it hits the uniqueness constraint,
+                # then stamp the specific label on top.
+                session.run(f"""
+                UNWIND $batch AS node_data
+                MERGE (n:Entity {{id: node_data.id}})
+                SET n:`{label}`, n += node_data.properties
+                """, batch=batch[i:i + BATCH_SIZE])
+            print(f"  - Merged {len(batch)} :{label} nodes.")
+    print(f"Successfully merged {len(nodes_data)} nodes.")
 
 def load_edges(driver, edges_data):
-    """Loads relationships (edges) into Neo4j."""
+    """Loads relationships (edges) into Neo4j.
+
+    Edges are grouped by relationship type so each query can use a native
+    MERGE with a static type instead of apoc.create.relationship per row.
+    """
     print(f"Loading {len(edges_data)} edges...")
+    by_type = defaultdict(list)
+    for edge in edges_data:
+        by_type[edge["relationship"]].append({
+            "source": edge["source"], "target": edge["target"],
+            "properties": edge.get("properties") or {},
+        })
+
     with driver.session() as session:
-        # This query is also updated to be more robust by using WITH.
-        result = session.run("""
-        UNWIND $edges AS edge_data
-        MATCH (source {id: edge_data.source})
-        MATCH (target {id: edge_data.target})
-        WITH source, target, edge_data
-        CALL apoc.create.relationship(
-            source, 
-            edge_data.relationship, 
-            edge_data.properties, 
-            target
-        ) YIELD rel
-        RETURN count(rel)
-        """, edges=edges_data)
-        count = result.single()[0]
-        print(f"Successfully created {count} relationships.")
+        for rel_type, batch in by_type.items():
+            for i in range(0, len(batch), BATCH_SIZE):
+                session.run(f"""
+                UNWIND $batch AS edge_data
+                MATCH (source:Entity {{id: edge_data.source}})
+                MATCH (target:Entity {{id: edge_data.target}})
+                MERGE (source)-[r:`{rel_type}`]->(target)
+                SET r += edge_data.properties
+                """, batch=batch[i:i + BATCH_SIZE])
+            print(f"  - Created {len(batch)} :{rel_type} relationships.")
+    print(f"Successfully created {len(edges_data)} relationships.")
 
 if __name__ == "__main__":
     try:
@@ -58,11 +91,14 @@ if __name__ == "__main__":
             with driver.session() as session:
                 session.run("MATCH (n) DETACH DELETE n")
 
-            with open("nodes.json", 'r', encoding='utf-8') as f:
-                nodes = json.load(f)
-            with open("edges.json", 'r', encoding='utf-8') as f:
-                edges = json.load(f)
-            
+            # orjson parses the multi-MB node/edge dumps several times faster
+            # than stdlib json (it wants bytes, hence the 'rb' opens).
+            with open("nodes.json", 'rb') as f:
+                nodes = orjson.loads(f.read())
+            with open("edges.json", 'rb') as f:
+                edges = orjson.loads(f.read())
+
+            create_indexes(driver)
             load_nodes(driver, nodes)
             load_edges(driver, edges)
             print("\nGraph data loading complete!")
@@ -1,65 +1,188 @@
 # loader_vectors.py
-import json
+import os
+import orjson
+import numpy as np
 import chromadb
-from sentence_transformers import SentenceTransformer
 from tqdm import tqdm
 
+from embedding import load_embedding_model
+
+# Optional: when processor.py wrote Parquet copies, read those instead of
+# the JSON — column pruning means we never even decode the fields this
+# loader doesn't use.
+try:
+    import pyarrow.parquet as pq
+except ImportError:
+    pq = None
+
 # --- Configuration ---
-MODEL_NAME = 'all-MiniLM-L6-v2' # A fast and effective open-source model
 CHROMA_PATH = "chroma_db"       # Directory to store the Chroma database on disk
 COLLECTION_NAME = "github_knowledge_base"
 
+# HNSW index parameters, applied when the collection is first created.
+# Bigger internal batch/sync thresholds amortize index writes across adds,
+# and higher construction_ef/M buys recall at build time (where we can
+# afford it) rather than query time.
+HNSW_PARAMS = {
+    "hnsw:batch_size": 1000,
+    "hnsw:sync_threshold": 10000,
+    "hnsw:construction_ef": 200,
+    "hnsw:M": 32,
+}
+
+def make_chroma_client():
+    """Returns an HTTP client when CHROMA_HOST is set, else the embedded one.
+
+    PersistentClient serializes all writes through SQLite in-process; for
+    ingesting from several processes, run `chroma run --path chroma_db`
+    and point CHROMA_HOST at it.
+    """
+    chroma_host = os.getenv("CHROMA_HOST")
+    if chroma_host:
+        print(f"Connecting to ChromaDB server at '{chroma_host}'...")
+        return chromadb.HttpClient(host=chroma_host)
+    return chromadb.PersistentClient(path=CHROMA_PATH)
+
 def generate_and_store_embeddings():
     """
     Loads nodes, generates embeddings for relevant text, and stores them in ChromaDB.
     """
     print("Initializing embedding model...")
-    model = SentenceTransformer(MODEL_NAME)
-    
+    model = load_embedding_model()
+    # MiniLM only looks at 256 tokens anyway; saying so explicitly keeps
+    # the tokenizer from chewing through text it's about to throw away.
+    model.max_seq_length = 256
+
     print("Initializing ChromaDB client...")
-    # This creates a persistent client that saves data to the CHROMA_PATH directory.
-    client = chromadb.PersistentClient(path=CHROMA_PATH)
-    
-    # Get or create the collection. This is idempotent.
-    collection = client.get_or_create_collection(name=COLLECTION_NAME)
+    client = make_chroma_client()
+
+    # Get or create the collection. This is idempotent, though the HNSW
+    # parameters only take effect when the collection is first created.
+    collection = client.get_or_create_collection(name=COLLECTION_NAME, metadata=HNSW_PARAMS)
 
-    print("Loading nodes from nodes.json...")
-    with open('nodes.json', 'r', encoding='utf-8') as f:
-        nodes = json.load(f)
+    if pq is not None and os.path.exists('nodes.parquet'):
+        # Columnar path: only the columns this loader actually touches are
+        # read and decoded; everything else stays compressed on disk.
+        print("Loading nodes from nodes.parquet (pruned columns)...")
+        node_table = pq.read_table(
+            'nodes.parquet', columns=['id', 'label', 'title', 'body', 'message', 'url'])
+        nodes = [
+            {"id": row['id'], "label": row['label'],
+             "properties": {"title": row['title'], "body": row['body'],
+                            "message": row['message'], "url": row['url']}}
+            for row in node_table.to_pylist()
+        ]
+
+        print("Loading edges from edges.parquet...")
+        edges = pq.read_table(
+            'edges.parquet', columns=['source', 'target', 'relationship']).to_pylist()
+    else:
+        print("Loading nodes from nodes.json...")
+        with open('nodes.json', 'rb') as f:
+            nodes = orjson.loads(f.read())
+
+        print("Loading edges from edges.json...")
+        with open('edges.json', 'rb') as f:
+            edges = orjson.loads(f.read())
+
+    # Join the graph edges into per-node lookup tables. The author, PR URL
+    # and technologies for every node are all known right here at build
+    # time — storing them as ChromaDB metadata means query time gets them
+    # for free from collection.query instead of a Neo4j round-trip.
+    pr_author = {}    # pr_id -> user login
+    commit_pr = {}    # commit sha -> pr_id
+    pr_techs = {}     # pr_id -> set of technology names
+    for edge in edges:
+        if edge['relationship'] == 'AUTHORED':
+            pr_author[edge['target']] = edge['source']
+        elif edge['relationship'] == 'INCLUDES':
+            commit_pr[edge['target']] = edge['source']
+        elif edge['relationship'] == 'USES_TECH':
+            pr_techs.setdefault(edge['source'], set()).add(edge['target'])
+
+    pr_urls = {
+        node['id']: node['properties'].get('url', '')
+        for node in nodes if node.get('label') == 'PullRequest'
+    }
 
     # Filter for nodes that have meaningful text to embed
     nodes_to_embed = [
-        node for node in nodes 
+        node for node in nodes
         if node.get('label') in ['PullRequest', 'Commit']
     ]
     print(f"Found {len(nodes_to_embed)} nodes to process for embeddings.")
-    
-    # Process in batches for efficiency
-    batch_size = 100
-    for i in tqdm(range(0, len(nodes_to_embed), batch_size), desc="Embedding & Storing in ChromaDB"):
-        batch = nodes_to_embed[i:i+batch_size]
-        
-        ids_to_add = [node['id'] for node in batch]
-        
-        # Create a single "document" string for each item to represent its semantic meaning.
-        documents_to_add = []
-        for node in batch:
-            if node['label'] == 'PullRequest':
-                text = f"Title: {node['properties'].get('title', '')}. Body: {node['properties'].get('body', '')}"
-            elif node['label'] == 'Commit':
-                text = f"Commit message: {node['properties'].get('message', '')}"
-            else:
-                text = "" # Should not happen due to our filter
-            documents_to_add.append(text)
-        
-        # Generate embeddings for the entire batch
-        embeddings_to_add = model.encode(documents_to_add, show_progress_bar=False).tolist()
-        
-        # Add the data to ChromaDB
+
+    # Build ALL documents up front; document construction is cheap, and
+    # having the full corpus ready lets the encoder see real batches.
+    all_ids = []
+    all_documents = []
+    all_metadatas = []
+    for node in nodes_to_embed:
+        # Create a single "document" string for each item to represent its
+        # semantic meaning. Text beyond the model's 256-token window gets
+        # truncated anyway, so cut it here BEFORE tokenization: ~1500 chars
+        # of body conservatively covers the window, and for commits the
+        # first line carries the meaning (merge commits can trail hundreds
+        # of auto-generated lines).
+        if node['label'] == 'PullRequest':
+            title = node['properties'].get('title') or ''
+            body = (node['properties'].get('body') or '')[:1500]
+            text = f"Title: {title}. Body: {body}"
+            pr_id = node['id']
+            content = title
+        elif node['label'] == 'Commit':
+            message = (node['properties'].get('message') or '').split('\n', 1)[0][:500]
+            text = f"Commit message: {message}"
+            pr_id = commit_pr.get(node['id'], '')
+            content = message
+        else:
+            text = "" # Should not happen due to our filter
+            pr_id = ''
+            content = ''
+        all_ids.append(node['id'])
+        all_documents.append(text)
+        # Metadata values must be scalars, so the technology set becomes a
+        # comma-joined string (qa_engine splits it back apart).
+        all_metadatas.append({
+            "author": pr_author.get(pr_id, '') or '',
+            "node_type": node['label'],
+            "content": content or '',
+            "pr_url": pr_urls.get(pr_id, '') or '',
+            "technologies": ",".join(sorted(pr_techs.get(pr_id, set())))
+        })
+
+    # Encode the ENTIRE corpus in one call, explicitly ordered shortest to
+    # longest. Each mini-batch then holds near-uniform lengths, so almost
+    # no attention FLOPs are spent on padding tokens — with PR bodies
+    # spanning tens to thousands of tokens, a random order pads most of
+    # every batch. The embeddings are scattered back to document order
+    # before anything downstream sees them.
+    print("Encoding all documents in one length-sorted batched pass...")
+    order = sorted(range(len(all_documents)), key=lambda i: len(all_documents[i]))
+    sorted_embeddings = model.encode(
+        [all_documents[i] for i in order],
+        batch_size=64,
+        show_progress_bar=True,
+        convert_to_numpy=True
+    )
+    embeddings = np.empty_like(sorted_embeddings)
+    embeddings[order] = sorted_embeddings
+
+    # Guarantee unit-length vectors regardless of encoder backend (a no-op
+    # for this model, which already ships a Normalize module). No dtype
+    # games here: Chroma stores and indexes float32 whatever we hand it,
+    # so a float16 cast would only add rounding noise and an extra copy.
+    embeddings = embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+
+    # Then stream the finished vectors into ChromaDB in large chunks; the
+    # write side no longer gates the encoder.
+    add_batch_size = 5000
+    for i in tqdm(range(0, len(all_ids), add_batch_size), desc="Storing in ChromaDB"):
         collection.add(
-            embeddings=embeddings_to_add,
-            documents=documents_to_add,
-            ids=ids_to_add
+            embeddings=embeddings[i:i+add_batch_size].tolist(),
+            documents=all_documents[i:i+add_batch_size],
+            metadatas=all_metadatas[i:i+add_batch_size],
+            ids=all_ids[i:i+add_batch_size]
         )
     
     print(f"\nSuccessfully stored embeddings for {collection.count()} documents in collection '{COLLECTION_NAME}'.")
@@ -67,7 +190,7 @@ def generate_and_store_embeddings():
 def test_semantic_search():
     """A quick test to show semantic search in action."""
     print("\n--- Testing Semantic Search ---")
-    client = chromadb.PersistentClient(path=CHROMA_PATH)
+    client = make_chroma_client()
     collection = client.get_collection(name=COLLECTION_NAME)
     query_text = "how to handle streaming responses"
     results = collection.query(query_texts=[query_text], n_results=3)
@@ -2,15 +2,46 @@
 
 import os
 import json
+import atexit
+import asyncio
+import threading
 import chromadb
 from dotenv import load_dotenv
-from neo4j import GraphDatabase
+from neo4j import AsyncGraphDatabase
 from openai import OpenAI
-from sentence_transformers import SentenceTransformer
+
+from embedding import load_query_encoder
 
 # --- Configuration and Initialization ---
 load_dotenv()
 
+# All async work in this module runs on one long-lived event loop driven
+# by a dedicated daemon thread. Callers hand coroutines over with
+# run_coroutine_threadsafe and block only on their own result, so
+# concurrent retrievals genuinely overlap — while one request is inside
+# the encoder forward pass the loop keeps serving the others. One loop
+# for the process also keeps the async Neo4j driver happy: its pooled
+# connections are bound to the loop they were created on.
+_engine_loop = None
+_engine_loop_lock = threading.Lock()
+
+def _get_engine_loop():
+    """Returns the shared engine loop, starting its thread on first use."""
+    global _engine_loop
+    if _engine_loop is None:
+        with _engine_loop_lock:
+            if _engine_loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(
+                    target=loop.run_forever, name="qa-engine-loop", daemon=True
+                ).start()
+                _engine_loop = loop
+    return _engine_loop
+
+def run_async(coro):
+    """Runs a coroutine on the engine loop and waits for its result."""
+    return asyncio.run_coroutine_threadsafe(coro, _get_engine_loop()).result()
+
 # Initialize OpenAI Client
 try:
     openai_client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
@@ -18,18 +49,28 @@ except Exception as e:
     print(f"Error initializing OpenAI client: {e}")
     exit()
 
+# The most queries the batch worker will coalesce into one encode +
+# collection.query round-trip.
+BATCH_MAX_SIZE = 32
+
 class KnowledgeRetriever:
     """
     A class to retrieve context from both the vector and graph databases.
     """
     def __init__(self):
         print("Initializing Knowledge Retriever...")
-        # Vector DB Connection
-        self.vector_client = chromadb.PersistentClient(path="chroma_db")
+        # Vector DB Connection — same env-driven choice as loader_vector,
+        # so server-mode ingests are read from the same place.
+        chroma_host = os.getenv("CHROMA_HOST")
+        if chroma_host:
+            self.vector_client = chromadb.HttpClient(host=chroma_host)
+        else:
+            self.vector_client = chromadb.PersistentClient(path="chroma_db")
         self.collection = self.vector_client.get_collection(name="github_knowledge_base")
         
-        # Embedding Model
-        self.embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
+        # Embedding Model: INT8 ONNX when exported, otherwise the regular
+        # (GPU/FP16 when available) SentenceTransformer.
+        self.embedding_model = load_query_encoder()
         
         # Graph DB Connection
         uri = os.getenv("NEO4J_URI")
@@ -43,60 +84,158 @@ class KnowledgeRetriever:
             raise ValueError("NEO4J_USER and NEO4J_PASSWORD environment variables must be set")
             
         auth = (neo4j_user, neo4j_password)
-        self.graph_driver = GraphDatabase.driver(uri, auth=auth)
-        self.graph_driver.verify_connectivity()
+        self.graph_driver = AsyncGraphDatabase.driver(uri, auth=auth)
+        run_async(self.graph_driver.verify_connectivity())
+
+        # Query-embedding cache. Q&A traffic repeats itself (example
+        # buttons, re-asked questions), and a hit skips the transformer
+        # forward pass entirely. Keyed by normalized text, LRU-evicted.
+        self._embedding_cache = {}
+        self._embedding_cache_max = 4096
+
+        # Micro-batching machinery, created lazily on the loop that first
+        # runs a search (see _batch_worker).
+        self._query_queue = None
+        self._batcher_task = None
         print("Retriever initialized successfully.")
 
-    def _semantic_search(self, query_text, n_results=10):
+    async def _semantic_search(self, query_text, n_results=10):
         """Performs semantic search on ChromaDB."""
         print(f"\n1. Performing semantic search for: '{query_text}'")
-        query_embedding = self.embedding_model.encode(query_text).tolist()
-        results = self.collection.query(
-            query_embeddings=[query_embedding],
-            n_results=n_results
-        )
-        print(f"  - Found {len(results['ids'][0])} candidate nodes.")
-        return results['ids'][0]
+        # Queries funnel through a queue so concurrent requests pending at
+        # the same time share one encoder forward pass and one
+        # collection.query round-trip (see _batch_worker).
+        if self._batcher_task is None or self._batcher_task.done():
+            self._query_queue = asyncio.Queue()
+            self._batcher_task = asyncio.get_running_loop().create_task(self._batch_worker())
+
+        future = asyncio.get_running_loop().create_future()
+        self._query_queue.put_nowait((query_text, n_results, future))
+        ids, metadatas = await future
+        print(f"  - Found {len(ids)} candidate nodes.")
+        return ids, metadatas
 
-    def _graph_enrichment(self, node_ids):
+    async def _embed_batch(self, texts):
+        """Returns one embedding per text, via the LRU cache; all cache
+        misses are encoded together in a single model call."""
+        cache_keys = [text.strip().lower() for text in texts]
+        misses = [i for i, key in enumerate(cache_keys) if key not in self._embedding_cache]
+        if misses:
+            # The torch/ONNX forward pass blocks, so it runs in a worker
+            # thread — the event loop stays free while a batch encodes.
+            encoded = await asyncio.to_thread(
+                self.embedding_model.encode, [texts[i] for i in misses])
+            for i, embedding in zip(misses, encoded):
+                if len(self._embedding_cache) >= self._embedding_cache_max:
+                    # Drop the least recently used entry (hits re-insert at
+                    # the end, so insertion order doubles as recency order).
+                    self._embedding_cache.pop(next(iter(self._embedding_cache)))
+                self._embedding_cache[cache_keys[i]] = embedding.tolist()
+
+        embeddings = []
+        for key in cache_keys:
+            embedding = self._embedding_cache.pop(key)
+            self._embedding_cache[key] = embedding  # refresh recency
+            embeddings.append(embedding)
+        return embeddings
+
+    async def _batch_worker(self):
+        """Drains the query queue in micro-batches.
+
+        Blocks for the first pending query, yields one loop pass so any
+        already-scheduled coroutines can enqueue too, then grabs whatever
+        is waiting (up to BATCH_MAX_SIZE). No timed window: a lone query
+        pays nothing extra, and batching still emerges exactly when it
+        helps — queries arriving while a batch is encoding accumulate in
+        the queue and get coalesced on the next round.
+        """
+        while True:
+            batch = [await self._query_queue.get()]
+            await asyncio.sleep(0)
+            while len(batch) < BATCH_MAX_SIZE:
+                try:
+                    batch.append(self._query_queue.get_nowait())
+                except asyncio.QueueEmpty:
+                    break
+
+            texts = [item[0] for item in batch]
+            futures = [item[2] for item in batch]
+            try:
+                embeddings = await self._embed_batch(texts)
+                results = await asyncio.to_thread(
+                    self.collection.query,
+                    query_embeddings=embeddings,
+                    n_results=max(item[1] for item in batch),
+                    include=['metadatas']
+                )
+                for i, (_, wanted_n, future) in enumerate(batch):
+                    if not future.done():
+                        future.set_result(
+                            (results['ids'][i][:wanted_n], results['metadatas'][i][:wanted_n]))
+            except Exception as e:
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(e)
+
+    async def _graph_enrichment(self, node_ids):
         """Enriches candidate nodes with graph context from Neo4j."""
         print("\n2. Enriching candidates with graph context...")
-        with self.graph_driver.session() as session:
-            # <--- THIS IS THE CORRECTED AND FINAL QUERY --->
-            result = session.run("""
+        async with self.graph_driver.session() as session:
+            # Every hop here is a plain one-relationship pattern: the id
+            # lookup hits the :Entity uniqueness index, INCLUDES replaces
+            # the old variable-length INCLUDES*0.. expansion, and USES_TECH
+            # replaces the relationship-property filter ({in_pr: pr.id})
+            # the planner could never index.
+            result = await session.run("""
             UNWIND $node_ids AS id
-            MATCH (node {id: id})
-            MATCH (author:User)-[:AUTHORED]->(pr:PullRequest)-[:INCLUDES*0..]->(node)
-            
-            WITH author, pr, node
-            
-            OPTIONAL MATCH (author)-[r:CONTRIBUTED_TO_TECHNOLOGY {in_pr: pr.id}]->(tech:Technology)
-            
-            WITH author, pr, node, COLLECT(DISTINCT tech.name) AS technologies, labels(node)[0] as node_type
+            MATCH (node:Entity {id: id})
+            OPTIONAL MATCH (node)<-[:INCLUDES]-(parent:PullRequest)
+            WITH node, coalesce(parent, node) AS pr
+            MATCH (author:User)-[:AUTHORED]->(pr:PullRequest)
+            OPTIONAL MATCH (pr)-[:USES_TECH]->(tech:Technology)
+
+            WITH node, pr, author, COLLECT(DISTINCT tech.name) AS technologies
 
-            RETURN 
+            RETURN
                 author.id AS author,
-                node_type,
-                CASE node_type
-                    WHEN 'PullRequest' THEN node.title
-                    WHEN 'Commit' THEN node.message
+                [l IN labels(node) WHERE l <> 'Entity'][0] AS node_type,
+                CASE
+                    WHEN node:PullRequest THEN node.title
+                    WHEN node:Commit THEN node.message
                     ELSE 'N/A'
                 END AS content,
                 pr.url as pr_url,
                 technologies
             """, node_ids=node_ids)
-            
-            context_list = [record.data() for record in result]
+
+            context_list = [record.data() async for record in result]
             print(f"  - Generated {len(context_list)} context snippets.")
             return context_list
 
-    def retrieve_context(self, query_text):
+    async def retrieve_context(self, query_text):
         """The main retrieval method orchestrating the two-step process."""
-        candidate_ids = self._semantic_search(query_text)
+        candidate_ids, metadatas = await self._semantic_search(query_text)
         if not candidate_ids:
             return ""
-            
-        enriched_context = self._graph_enrichment(candidate_ids)
+
+        # The loader pre-materializes the enrichment row (author, PR url,
+        # technologies) as metadata on every vector, so collection.query
+        # already returned everything we need — no Neo4j round-trip. The
+        # graph query remains as a fallback for collections built before
+        # metadata existed.
+        if metadatas and all(metadatas):
+            enriched_context = [
+                {
+                    "author": meta.get("author") or "N/A",
+                    "node_type": meta.get("node_type"),
+                    "content": meta.get("content"),
+                    "pr_url": meta.get("pr_url") or "N/A",
+                    "technologies": [t for t in meta.get("technologies", "").split(",") if t]
+                }
+                for meta in metadatas
+            ]
+        else:
+            enriched_context = await self._graph_enrichment(candidate_ids)
         
         # Format the context into a single string for the LLM
         context_str = ""
@@ -109,6 +248,20 @@ class KnowledgeRetriever:
             )
         return context_str
 
+# Stable synthesis instructions, kept byte-identical across calls (and out
+# of the per-call user message) so the prefix is eligible for OpenAI's
+# server-side prompt caching — cheaper input tokens and faster first token.
+SYNTHESIS_INSTRUCTIONS = """You are a helpful engineering knowledge assistant designed to provide expertise profiles from a GitHub knowledge base.
+
+You will be given a CONTEXT block of evidence snippets retrieved from the knowledge base, followed by a USER QUESTION. Each snippet describes a contribution: who made it, what kind of node it is (pull request or commit), its content, the PR URL, and the technologies involved.
+
+Follow these rules when answering:
+- Answer the user's question based *only* on the provided context.
+- Do not make up information. If the context doesn't contain the answer, say so.
+- Summarize the findings and identify the key people related to the user's query.
+- For each person you identify, cite the evidence from the context (the contribution content, PR URL, or technologies).
+"""
+
 class AnswerSynthesizer:
     """
     Uses an LLM to synthesize an answer from the retrieved context.
@@ -122,29 +275,11 @@ class AnswerSynthesizer:
         if not context:
             return "I couldn't find any relevant information in the knowledge base to answer your question."
 
-        # This is our prompt template. It's crucial for guiding the LLM.
-        prompt = f"""
-        You are an AI assistant designed to provide expertise profiles from a GitHub knowledge base.
-        Your goal is to answer the user's question based *only* on the provided context.
-        Do not make up information. If the context doesn't contain the answer, say so.
-        Summarize the findings and identify the key people related to the user's query.
-        For each person you identify, cite the evidence from the context.
-
-        CONTEXT:
-        ---
-        {context}
-        ---
-
-        USER QUESTION: {query}
-
-        ANSWER:
-        """
-        
         response = self.client.chat.completions.create(
             model=self.model,
             messages=[
-                {"role": "system", "content": "You are a helpful engineering knowledge assistant."},
-                {"role": "user", "content": prompt}
+                {"role": "system", "content": SYNTHESIS_INSTRUCTIONS},
+                {"role": "user", "content": f"CONTEXT:\n---\n{context}\n---\n\nUSER QUESTION: {query}\n\nANSWER:"}
             ],
             temperature=0.2 # Lower temperature for more factual answers
         )
@@ -155,16 +290,43 @@ class AnswerSynthesizer:
 # qa_engine.py (Refactored for Router)
 # ... (all imports and class definitions remain the same) ...
 
+# Process-wide singletons. This module lives in sys.modules, so unlike the
+# Streamlit main script it is only initialized once per process — the apps
+# get the cached retriever/synthesizer on every rerun without going through
+# st.cache_resource's locking and hashing. Lazy so importing this module
+# doesn't load the embedding model or connect to the databases.
+_retriever_singleton = None
+_synthesizer_singleton = None
+_singleton_lock = threading.Lock()
+
+def get_retriever():
+    """Returns the shared KnowledgeRetriever, creating it on first use."""
+    global _retriever_singleton
+    if _retriever_singleton is None:
+        with _singleton_lock:
+            if _retriever_singleton is None:
+                _retriever_singleton = KnowledgeRetriever()
+                atexit.register(lambda: run_async(_retriever_singleton.graph_driver.close()))
+    return _retriever_singleton
+
+def get_synthesizer():
+    """Returns the shared AnswerSynthesizer, creating it on first use."""
+    global _synthesizer_singleton
+    if _synthesizer_singleton is None:
+        with _singleton_lock:
+            if _synthesizer_singleton is None:
+                _synthesizer_singleton = AnswerSynthesizer(openai_client)
+    return _synthesizer_singleton
+
 # NEW: Top-level function for the router to call
 def semantic_search_for_concept(query_text):
     """
     The main entry point for semantic, conceptual searches.
     """
-    # Lazily initialize to avoid loading models if not needed
-    retriever = KnowledgeRetriever()
-    synthesizer = AnswerSynthesizer(openai_client)
+    retriever = get_retriever()
+    synthesizer = get_synthesizer()
 
-    context = retriever.retrieve_context(query_text)
+    context = run_async(retriever.retrieve_context(query_text))
     answer = synthesizer.generate_answer(query_text, context)
     return answer
 